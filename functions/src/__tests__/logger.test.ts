@@ -2,7 +2,7 @@
  * Unit tests for structured logger utility
  */
 
-import { formatMessage } from '../logger';
+import { formatMessage, isDebugEnabled } from '../logger';
 
 describe('logger', () => {
   describe('formatMessage', () => {
@@ -56,4 +56,31 @@ describe('logger', () => {
       expect(result).toBe('[abc123de] Test message');
     });
   });
+
+  describe('isDebugEnabled', () => {
+    const originalLogLevel = process.env.LOG_LEVEL;
+
+    afterEach(() => {
+      if (originalLogLevel === undefined) {
+        delete process.env.LOG_LEVEL;
+      } else {
+        process.env.LOG_LEVEL = originalLogLevel;
+      }
+    });
+
+    it('should be enabled when LOG_LEVEL is DEBUG', () => {
+      process.env.LOG_LEVEL = 'DEBUG';
+      expect(isDebugEnabled()).toBe(true);
+    });
+
+    it('should be disabled when LOG_LEVEL is not set', () => {
+      delete process.env.LOG_LEVEL;
+      expect(isDebugEnabled()).toBe(false);
+    });
+
+    it('should be disabled for other log levels', () => {
+      process.env.LOG_LEVEL = 'INFO';
+      expect(isDebugEnabled()).toBe(false);
+    });
+  });
 });
@@ -0,0 +1,59 @@
+/**
+ * Unit tests for streaming Storage downloads
+ */
+
+import { Readable } from 'stream';
+import { downloadToBuffer } from '../storageDownload';
+
+// Stub a Storage file whose read stream yields the given chunks
+function stubFile(chunks: Buffer[]) {
+  return {
+    createReadStream: jest.fn(() => Readable.from(chunks)),
+    download: jest.fn(async (): Promise<[Buffer]> => [Buffer.concat(chunks)])
+  };
+}
+
+describe('downloadToBuffer', () => {
+  it('should assemble chunks that exactly match the expected size', async () => {
+    const file = stubFile([Buffer.from('abc'), Buffer.from('def'), Buffer.from('g')]);
+
+    const result = await downloadToBuffer(file, 7);
+
+    expect(result.length).toBe(7);
+    expect(result.toString()).toBe('abcdefg');
+  });
+
+  it('should handle an empty object', async () => {
+    const result = await downloadToBuffer(stubFile([]), 0);
+
+    expect(result.length).toBe(0);
+  });
+
+  it('should reject a stream shorter than the expected size', async () => {
+    const file = stubFile([Buffer.from('abc'), Buffer.from('de')]);
+
+    await expect(downloadToBuffer(file, 8)).rejects.toThrow(
+      'Audio download incomplete: received 5 of 8 bytes'
+    );
+  });
+
+  it('should reject a stream longer than the expected size', async () => {
+    const file = stubFile([Buffer.from('abc'), Buffer.from('defg')]);
+
+    await expect(downloadToBuffer(file, 5)).rejects.toThrow(
+      'Audio download exceeded expected size of 5 bytes'
+    );
+  });
+
+  it('should fall back to download() for content-encoded objects', async () => {
+    // gzip objects are decompressed in transit, so more bytes arrive than
+    // the stored (compressed) size in the metadata
+    const file = stubFile([Buffer.from('decompressed'), Buffer.from(' audio')]);
+
+    const result = await downloadToBuffer(file, 5, 'gzip');
+
+    expect(result.toString()).toBe('decompressed audio');
+    expect(file.download).toHaveBeenCalledTimes(1);
+    expect(file.createReadStream).not.toHaveBeenCalled();
+  });
+});
@@ -14,6 +14,7 @@
 
 import Replicate from 'replicate';
 import fuzz from 'fuzzball';
+import { isDebugEnabled, log } from './logger';
 
 // Whisper diarization model on Replicate - provides word-level timestamps + speaker diarization
 // Using rafaelgalle/whisper-diarization-advanced: stable, recently updated, good for multi-speaker audio
@@ -1258,6 +1259,43 @@ function alignSegmentsHardy(
 // WhisperX Integration
 // =============================================================================
 
+// Replicate client reused across invocations on a warm instance.
+// Keyed by token so a rotated secret picks up a fresh client.
+let replicateClient: Replicate | null = null;
+let replicateClientToken: string | null = null;
+
+function getReplicateClient(replicateToken: string): Replicate {
+  /** Return the cached Replicate client, creating it on first use. */
+  if (!replicateClient || replicateClientToken !== replicateToken) {
+    replicateClient = new Replicate({ auth: replicateToken });
+    replicateClientToken = replicateToken;
+  }
+  return replicateClient;
+}
+
+// Array items included in raw output previews - enough to see the structure
+const RAW_OUTPUT_PREVIEW_ITEMS = 3;
+
+function previewRawOutput(outputObj: Record<string, unknown>, maxChars: number): string {
+  /**
+   * Serialize a truncated view of the raw Replicate output for diagnostics.
+   *
+   * Every top-level array (segments, word lists, ...) is cut to its first few
+   * items before stringifying, so the cost no longer scales with transcript
+   * length (the full output can be several MB of word data).
+   */
+  const preview: Record<string, unknown> = {};
+  for (const [key, value] of Object.entries(outputObj)) {
+    preview[key] = Array.isArray(value) ? value.slice(0, RAW_OUTPUT_PREVIEW_ITEMS) : value;
+  }
+  return JSON.stringify(preview, null, 2).slice(0, maxChars);
+}
+
+function base64Length(byteLength: number): number {
+  /** Length of the padded base64 encoding of byteLength bytes, without encoding. */
+  return Math.ceil(byteLength / 3) * 4;
+}
+
 async function getWhisperxTimestamps(
   audioBase64: string,
   replicateToken: string
@@ -1442,12 +1480,14 @@ async function getWhisperxTimestamps(
 
 /**
  * WhisperX segment from the raw API output
+ * Readonly is a compile-time contract only - consumers build new objects
+ * instead of editing these in place.
  */
 export interface WhisperXSegment {
-  text: string;
-  start: number;  // seconds
-  end: number;    // seconds
-  speaker?: string;  // May have speaker diarization (e.g., "SPEAKER_00")
+  readonly text: string;
+  readonly start: number;  // seconds
+  readonly end: number;    // seconds
+  readonly speaker?: string;  // May have speaker diarization (e.g., "SPEAKER_00")
 }
 
 /**
@@ -1475,7 +1515,7 @@ export async function transcribeWithWhisperX(
   replicateToken: string,
   huggingfaceToken?: string
 ): Promise<WhisperXResult> {
-  console.log('[WhisperX] Starting transcription (primary method)');
+  log.info('Starting transcription (primary method)', { stage: 'whisperx' });
 
   if (!replicateToken) {
     return {
@@ -1486,38 +1526,40 @@ export async function transcribeWithWhisperX(
   }
 
   try {
-    // Encode audio to base64
-    const audioBase64 = audioBuffer.toString('base64');
-    const audioSizeMb = audioBuffer.length / (1024 * 1024);
-
-    console.log(
-      `[WhisperX] Calling Replicate API: ` +
-      `audio_size=${audioSizeMb.toFixed(2)}MB`
-    );
+    log.info('Calling Replicate API', {
+      stage: 'whisperx',
+      audioBytes: audioBuffer.length,
+      audioSizeMB: (audioBuffer.length / 1048576).toFixed(2),
+      base64Length: base64Length(audioBuffer.length)
+    });
 
     // Call whisper-diarization-advanced via Replicate
-    const Replicate = (await import('replicate')).default;
-    const client = new Replicate({ auth: replicateToken });
+    const client = getReplicateClient(replicateToken);
 
     // Build input params - rafaelgalle/whisper-diarization-advanced has built-in diarization
+    // Encoded only when the payload is built - the string is ~1.33x the audio size
     const inputParams: Record<string, unknown> = {
-      file_string: audioBase64,  // Base64 encoded audio (not data URI)
+      file_string: audioBuffer.toString('base64'),  // Base64 encoded audio (not data URI)
       language: 'en'
     };
 
     // Note: huggingfaceToken is no longer needed - diarization is built-in
     if (huggingfaceToken) {
-      console.log('[WhisperX] Note: HF token provided but not needed - diarization is built-in');
+      log.info('HF token provided but not needed - diarization is built-in', { stage: 'whisperx' });
     }
-    console.log('[WhisperX] Speaker diarization enabled (built-in)');
+    log.info('Speaker diarization enabled (built-in)', { stage: 'whisperx' });
 
-    const startTime = Date.now();
+    const startTime = performance.now();
     const output = await client.run(
       WHISPERX_MODEL as `${string}/${string}:${string}`,
       { input: inputParams }
     );
-    const duration = ((Date.now() - startTime) / 1000).toFixed(1);
-    console.log(`[WhisperX] API call completed in ${duration}s`);
+    const durationMs = Math.round(performance.now() - startTime);
+    log.info('API call completed', {
+      stage: 'whisperx',
+      durationMs,
+      durationSec: (durationMs / 1000).toFixed(1)
+    });
 
     // Parse the output to extract segments
     const segments: WhisperXSegment[] = [];
@@ -1527,27 +1569,21 @@ export async function transcribeWithWhisperX(
 
       // === DIAGNOSTIC LOGGING ===
       // Log raw output structure to debug model format differences
-      console.log('[WhisperX] === RAW OUTPUT DIAGNOSTIC ===');
-      console.log(`[WhisperX] Output type: ${typeof output}`);
-      console.log(`[WhisperX] Output keys: ${Object.keys(outputObj).join(', ')}`);
-
-      // Log first 3000 chars of raw output for structure inspection
-      const rawOutputStr = JSON.stringify(output, null, 2);
-      console.log(`[WhisperX] Raw output (first 3000 chars):\n${rawOutputStr.substring(0, 3000)}`);
-
-      // Log specific field types
-      console.log(`[WhisperX] Field types: ${Object.entries(outputObj).map(([k, v]) =>
-        `${k}=${Array.isArray(v) ? `array[${v.length}]` : typeof v}`
-      ).join(', ')}`);
-
-      // If segments exist, log first 3 segment structures
-      if (Array.isArray(outputObj.segments) && outputObj.segments.length > 0) {
-        console.log(`[WhisperX] First 3 segments structure:`);
-        outputObj.segments.slice(0, 3).forEach((seg, i) => {
-          console.log(`[WhisperX]   Segment ${i}: ${JSON.stringify(seg)}`);
+      // (debug-only: the preview and field map are built on every call otherwise)
+      if (isDebugEnabled()) {
+        log.debug('Raw output diagnostic', {
+          stage: 'whisperx',
+          outputType: typeof output,
+          outputKeys: Object.keys(outputObj),
+          // Field types, e.g. segments=array[120]
+          fieldTypes: Object.fromEntries(Object.entries(outputObj).map(([k, v]) =>
+            [k, Array.isArray(v) ? `array[${v.length}]` : typeof v]
+          )),
+          // First 3000 chars of raw output for structure inspection
+          // (includes the first segments, so they are not dumped again separately)
+          rawOutputPreview: previewRawOutput(outputObj, 3000)
         });
       }
-      console.log('[WhisperX] === END DIAGNOSTIC ===');
 
       if (Array.isArray(outputObj.segments)) {
         for (const segment of outputObj.segments) {
@@ -1569,7 +1605,7 @@ export async function transcribeWithWhisperX(
     }
 
     if (segments.length === 0) {
-      console.error('[WhisperX] No segments returned - check audio format');
+      log.error('No segments returned - check audio format', { stage: 'whisperx' });
       return {
         segments: [],
         status: 'error',
@@ -1582,24 +1618,25 @@ export async function transcribeWithWhisperX(
     const lastSeg = segments[segments.length - 1];
     const totalDuration = lastSeg.end - firstSeg.start;
 
-    console.log(
-      `[WhisperX] ✅ Transcription complete: ` +
-      `segments=${segments.length}, ` +
-      `duration=${totalDuration.toFixed(1)}s ` +
-      `(${firstSeg.start.toFixed(1)}s to ${lastSeg.end.toFixed(1)}s)`
-    );
+    log.info('✅ Transcription complete', {
+      stage: 'whisperx',
+      segmentCount: segments.length,
+      durationSec: totalDuration.toFixed(1),
+      startSec: firstSeg.start.toFixed(1),
+      endSec: lastSeg.end.toFixed(1)
+    });
 
     // Log speaker distribution if available
-    const speakerCounts: Record<string, number> = {};
-    segments.forEach(s => {
-      if (s.speaker) {
-        speakerCounts[s.speaker] = (speakerCounts[s.speaker] || 0) + 1;
+    if (isDebugEnabled()) {
+      const speakerCounts: Record<string, number> = {};
+      segments.forEach(s => {
+        if (s.speaker) {
+          speakerCounts[s.speaker] = (speakerCounts[s.speaker] || 0) + 1;
+        }
+      });
+      if (Object.keys(speakerCounts).length > 0) {
+        log.debug('Speaker distribution', { stage: 'whisperx', speakerCounts });
       }
-    });
-    if (Object.keys(speakerCounts).length > 0) {
-      console.debug(
-        `[WhisperX] Speaker distribution: ${JSON.stringify(speakerCounts)}`
-      );
     }
 
     return {
@@ -1609,7 +1646,7 @@ export async function transcribeWithWhisperX(
 
   } catch (error) {
     const errorMsg = error instanceof Error ? error.message : String(error);
-    console.error(`[WhisperX] ❌ API call failed: ${errorMsg}`);
+    log.error('❌ API call failed', { stage: 'whisperx', errorMessage: errorMsg });
     return {
       segments: [],
       status: 'error',
@@ -27,6 +27,15 @@ export function formatMessage(message: string, context?: LogContext): string {
   return `${prefix}${stage} ${message}`.trim();
 }
 
+/**
+ * Whether debug-level logs are emitted (LOG_LEVEL=DEBUG)
+ * Check this before building expensive debug-only payloads so production
+ * runs don't pay for strings that are thrown away.
+ */
+export function isDebugEnabled(): boolean {
+  return process.env.LOG_LEVEL === 'DEBUG';
+}
+
 /**
  * Logger interface for type-safe logging
  */
@@ -73,7 +82,7 @@ export const log: Logger = {
    */
   debug(message: string, context?: LogContext): void {
     // Only log debug messages if LOG_LEVEL is DEBUG
-    if (process.env.LOG_LEVEL === 'DEBUG') {
+    if (isDebugEnabled()) {
       const formatted = formatMessage(message, context);
       logger.debug(formatted, context);
     }
@@ -99,9 +108,9 @@ export const log: Logger = {
     fn: () => Promise<T>,
     context?: LogContext
   ): Promise<{ result: T; durationMs: number }> {
-    const startTime = Date.now();
+    const startTime = performance.now();
     const result = await fn();
-    const durationMs = Date.now() - startTime;
+    const durationMs = Math.round(performance.now() - startTime);
 
     this.timing(operation, durationMs, context);
 
@@ -0,0 +1,55 @@
+/**
+ * Storage download helpers
+ *
+ * Streams Cloud Storage objects into memory without the extra copy that
+ * file.download() makes when it concatenates its chunks.
+ */
+
+/**
+ * Anything that can stream or download its contents.
+ * A Cloud Storage File satisfies this; tests can pass a stub.
+ */
+export interface ReadableSource {
+  createReadStream(): NodeJS.ReadableStream;
+  download(): Promise<[Buffer]>;
+}
+
+/**
+ * Stream a Storage object into a single buffer sized from its metadata.
+ *
+ * file.download() collects every chunk and concatenates them at the end,
+ * briefly holding two full copies of the audio. Copying chunks into a
+ * preallocated buffer as they arrive keeps peak memory at one copy.
+ *
+ * Objects stored with a Content-Encoding (e.g. gzip) are decompressed while
+ * streaming, so the metadata size is not the number of bytes received.
+ * Those fall back to file.download(), which handles any length.
+ */
+export async function downloadToBuffer(
+  file: ReadableSource,
+  sizeBytes: number,
+  contentEncoding?: string
+): Promise<Buffer> {
+  if (contentEncoding) {
+    const [contents] = await file.download();
+    return contents;
+  }
+
+  const buffer = Buffer.allocUnsafe(sizeBytes);
+  let offset = 0;
+
+  for await (const chunk of file.createReadStream()) {
+    const data = chunk as Buffer;
+    if (offset + data.length > sizeBytes) {
+      throw new Error(`Audio download exceeded expected size of ${sizeBytes} bytes`);
+    }
+    data.copy(buffer, offset);
+    offset += data.length;
+  }
+
+  if (offset !== sizeBytes) {
+    throw new Error(`Audio download incomplete: received ${offset} of ${sizeBytes} bytes`);
+  }
+
+  return buffer;
+}
@@ -17,6 +17,7 @@ import { FieldValue } from 'firebase-admin/firestore';
 import { db, bucket } from './index';
 import { ProgressManager, ProcessingStep } from './progressManager';
 import { transcribeWithWhisperX, WhisperXSegment } from './alignment';
+import { downloadToBuffer } from './storageDownload';
 import {
   recordMetrics,
   calculateCost,
@@ -24,12 +25,18 @@ import {
   LLMUsage
 } from './metrics';
 import { recordUserEvent } from './userEvents';
+import { log } from './logger';
 
 // Define secrets (set via: firebase functions:secrets:set <SECRET_NAME>)
 const geminiApiKey = defineSecret('GEMINI_API_KEY');
 const replicateApiToken = defineSecret('REPLICATE_API_TOKEN');
 const huggingfaceAccessToken = defineSecret('HUGGINGFACE_ACCESS_TOKEN');  // For speaker diarization
 
+// Largest audio file we will download and send to WhisperX.
+// Matches the upload limit in storage.rules; enforced here too because
+// objects written with admin credentials bypass the rules.
+const MAX_AUDIO_BYTES = 100 * 1024 * 1024;
+
 // Gemini analysis-only response (analyzes WhisperX transcript)
 interface GeminiAnalysis {
   title: string;
@@ -66,13 +73,14 @@ interface Speaker {
   colorIndex: number;
 }
 
+// Built once in mergeWhisperXAndGeminiData and never edited afterwards
 interface Segment {
-  segmentId: string;
-  index: number;
-  speakerId: string;
-  startMs: number;
-  endMs: number;
-  text: string;
+  readonly segmentId: string;
+  readonly index: number;
+  readonly speakerId: string;
+  readonly startMs: number;
+  readonly endMs: number;
+  readonly text: string;
 }
 
 interface Term {
@@ -131,6 +139,8 @@ export const transcribeAudio = onObjectFinalized(
   {
     secrets: [geminiApiKey, replicateApiToken, huggingfaceAccessToken],
     memory: '1GiB', // Audio processing needs more memory
+    cpu: 1, // Full vCPU for base64 encoding, WhisperX output parsing and Gemini prompt building (1GiB defaults to a fractional CPU)
+    concurrency: 1, // One file per instance - each holds the audio plus its base64 copy in memory
     timeoutSeconds: 540, // 9 minutes (max for 1st gen functions)
     region: 'us-central1'
   },
@@ -139,7 +149,8 @@ export const transcribeAudio = onObjectFinalized(
     const contentType = event.data.contentType;
 
     // DEBUG: Log raw event data for troubleshooting
-    console.debug('[Transcribe] Storage event received:', {
+    log.debug('Storage event received', {
+      stage: 'transcribe',
       bucket: event.data.bucket,
       name: event.data.name,
       contentType: event.data.contentType,
@@ -153,14 +164,14 @@ export const transcribeAudio = onObjectFinalized(
 
     // Only process audio files in the audio/ directory
     if (!filePath.startsWith('audio/') || !contentType?.startsWith('audio/')) {
-      console.debug('[Transcribe] Skipping non-audio file:', { filePath, contentType });
+      log.debug('Skipping non-audio file', { stage: 'transcribe', filePath, contentType });
       return;
     }
 
     // Parse path: audio/{userId}/{conversationId}.{ext}
     const pathParts = filePath.split('/');
     if (pathParts.length !== 3) {
-      console.error('[Transcribe] Invalid audio path structure:', filePath);
+      log.error('Invalid audio path structure', { stage: 'transcribe', filePath });
       return;
     }
 
@@ -169,10 +180,12 @@ export const transcribeAudio = onObjectFinalized(
     const conversationId = fileName.split('.')[0];
     const fileExtension = fileName.split('.').pop();
 
-    console.log('[Transcribe] Processing audio file:', {
+    // Every log below carries the conversation and user for traceability
+    const convLog = log.child({ conversationId, userId });
+
+    convLog.info('Processing audio file', {
+      stage: 'transcribe',
       filePath,
-      userId,
-      conversationId,
       contentType,
       fileExtension,
       sizeBytes: event.data.size,
@@ -183,6 +196,14 @@ export const transcribeAudio = onObjectFinalized(
     const progressManager = new ProgressManager(conversationId);
 
     try {
+      // Reject oversized files from the event metadata, before buffering them in memory
+      if (event.data.size >= MAX_AUDIO_BYTES) {
+        throw new Error(
+          `Audio file too large: ${(event.data.size / (1024 * 1024)).toFixed(1)}MB ` +
+          `exceeds ${MAX_AUDIO_BYTES / (1024 * 1024)}MB limit`
+        );
+      }
+
       // Update status to processing
       await db.collection('conversations').doc(conversationId).update({
         status: 'processing',
@@ -193,14 +214,14 @@ export const transcribeAudio = onObjectFinalized(
       await progressManager.setStep(ProcessingStep.TRANSCRIBING);
 
       // Download audio file to memory
-      console.debug('[Transcribe] Starting audio download from Storage...');
-      const downloadStartTime = Date.now();
+      convLog.debug('Starting audio download from Storage', { stage: 'download' });
+      const downloadStartTime = performance.now();
       const file = bucket.file(filePath);
-      const [audioBuffer] = await file.download();
-      const downloadDurationMs = Date.now() - downloadStartTime;
+      const audioBuffer = await downloadToBuffer(file, event.data.size, event.data.contentEncoding);
+      const downloadDurationMs = Math.round(performance.now() - downloadStartTime);
 
-      console.log('[Transcribe] Audio downloaded:', {
-        conversationId,
+      convLog.info('Audio downloaded', {
+        stage: 'download',
         bufferSizeBytes: audioBuffer.length,
         bufferSizeMB: (audioBuffer.length / (1024 * 1024)).toFixed(2),
         downloadDurationMs,
@@ -209,13 +230,13 @@ export const transcribeAudio = onObjectFinalized(
 
       // === NEW ARCHITECTURE: WhisperX-first transcription ===
       // Step 1: Get transcript + timestamps from WhisperX
-      console.log('[Transcribe] Step 1: Calling WhisperX for transcription...');
-      const whisperxStartTime = Date.now();
+      convLog.info('Step 1: Calling WhisperX for transcription', { stage: 'whisperx' });
+      const whisperxStartTime = performance.now();
 
       // Pass HF token for speaker diarization (optional but recommended)
       const hfToken = huggingfaceAccessToken.value();
       if (!hfToken) {
-        console.warn('[Transcribe] HUGGINGFACE_ACCESS_TOKEN not set - speaker diarization will be disabled');
+        convLog.warn('HUGGINGFACE_ACCESS_TOKEN not set - speaker diarization will be disabled', { stage: 'whisperx' });
       }
 
       const whisperxResult = await transcribeWithWhisperX(
@@ -224,14 +245,14 @@ export const transcribeAudio = onObjectFinalized(
         hfToken || undefined  // Pass undefined if empty to trigger warning
       );
 
-      const whisperxDurationMs = Date.now() - whisperxStartTime;
+      const whisperxDurationMs = Math.round(performance.now() - whisperxStartTime);
 
       if (whisperxResult.status === 'error') {
         throw new Error(`WhisperX failed: ${whisperxResult.error}`);
       }
 
-      console.log('[Transcribe] WhisperX transcription complete:', {
-        conversationId,
+      convLog.info('WhisperX transcription complete', {
+        stage: 'whisperx',
         durationMs: whisperxDurationMs,
         durationSec: (whisperxDurationMs / 1000).toFixed(1),
         segmentCount: whisperxResult.segments.length,
@@ -240,17 +261,18 @@ export const transcribeAudio = onObjectFinalized(
       });
 
       // Step 2: Build segments from WhisperX output
-      console.debug('[Transcribe] Step 2: Building segments from WhisperX...');
-      const buildStartTime = Date.now();
+      convLog.debug('Step 2: Building segments from WhisperX', { stage: 'segments' });
+      const buildStartTime = performance.now();
 
       const whisperxSegments = buildSegmentsFromWhisperX(whisperxResult.segments);
 
       // Step 2.5: Fix segment boundaries (diarization often splits a few words late)
-      console.debug('[Transcribe] Step 2.5: Fixing segment boundaries...');
+      convLog.debug('Step 2.5: Fixing segment boundaries', { stage: 'segments' });
       whisperxSegments.segments = fixSegmentBoundaries(whisperxSegments.segments);
 
-      const buildDurationMs = Date.now() - buildStartTime;
-      console.debug('[Transcribe] Segments built:', {
+      const buildDurationMs = Math.round(performance.now() - buildStartTime);
+      convLog.debug('Segments built', {
+        stage: 'segments',
         buildDurationMs,
         segmentCount: whisperxSegments.segments.length,
         speakerCount: whisperxSegments.speakers.length
@@ -260,19 +282,36 @@ export const transcribeAudio = onObjectFinalized(
       await progressManager.setStep(ProcessingStep.ANALYZING);
 
       // Step 3: Call Gemini to analyze the transcript (not the audio!)
-      console.log('[Transcribe] Step 3: Calling Gemini for analysis...');
-      const geminiStartTime = Date.now();
-
-      const analysisResult = await analyzeTranscriptWithGemini(
-        whisperxSegments.segments,
-        whisperxSegments.speakers,
-        geminiApiKey.value()
-      );
+      // Step 3.5: Speaker reassignment pass (reassign only, no splits/timestamp changes)
+      // Both calls only read the WhisperX transcript, so they run concurrently
+      convLog.info('Step 3: Calling Gemini for analysis and speaker reassignments', { stage: 'gemini' });
+      const geminiStartTime = performance.now();
+      let geminiDurationMs = 0;
+      let speakerCorrectionDurationMs = 0;
+
+      const [analysisResult, correctionResult] = await Promise.all([
+        analyzeTranscriptWithGemini(
+          whisperxSegments.segments,
+          whisperxSegments.speakers,
+          geminiApiKey.value()
+        ).then(result => {
+          geminiDurationMs = Math.round(performance.now() - geminiStartTime);
+          return result;
+        }),
+        identifySpeakerReassignments(
+          whisperxSegments.segments,
+          whisperxSegments.speakers,
+          geminiApiKey.value()
+        ).then(result => {
+          speakerCorrectionDurationMs = Math.round(performance.now() - geminiStartTime);
+          return result;
+        })
+      ]);
       const { analysis, tokenUsage: geminiAnalysisTokens } = analysisResult;
+      const { corrections: speakerCorrections, tokenUsage: geminiCorrectionTokens } = correctionResult;
 
-      const geminiDurationMs = Date.now() - geminiStartTime;
-      console.log('[Transcribe] Gemini analysis complete:', {
-        conversationId,
+      convLog.info('Gemini analysis complete', {
+        stage: 'gemini',
         durationMs: geminiDurationMs,
         durationSec: (geminiDurationMs / 1000).toFixed(1),
         title: analysis.title,
@@ -283,20 +322,8 @@ export const transcribeAudio = onObjectFinalized(
         outputTokens: geminiAnalysisTokens.outputTokens
       });
 
-      // Step 3.5: Speaker reassignment pass (reassign only, no splits/timestamp changes)
-      console.log('[Transcribe] Step 3.5: Identifying speaker reassignments...');
-      const speakerCorrectionStartTime = Date.now();
-
-      const correctionResult = await identifySpeakerReassignments(
-        whisperxSegments.segments,
-        whisperxSegments.speakers,
-        geminiApiKey.value()
-      );
-      const { corrections: speakerCorrections, tokenUsage: geminiCorrectionTokens } = correctionResult;
-
-      const speakerCorrectionDurationMs = Date.now() - speakerCorrectionStartTime;
-      console.log('[Transcribe] Speaker reassignment analysis complete:', {
-        conversationId,
+      convLog.info('Speaker reassignment analysis complete', {
+        stage: 'gemini',
         durationMs: speakerCorrectionDurationMs,
         durationSec: (speakerCorrectionDurationMs / 1000).toFixed(1),
         correctionCount: speakerCorrections.length,
@@ -317,8 +344,8 @@ export const transcribeAudio = onObjectFinalized(
       await progressManager.setStep(ProcessingStep.FINALIZING);
 
       // Step 4: Transform to our data model (merge WhisperX + Gemini)
-      console.debug('[Transcribe] Step 4: Merging WhisperX and Gemini data...');
-      const transformStartTime = Date.now();
+      convLog.debug('Step 4: Merging WhisperX and Gemini data', { stage: 'merge' });
+      const transformStartTime = performance.now();
 
       const processedData = mergeWhisperXAndGeminiData(
         whisperxSegments,
@@ -327,8 +354,9 @@ export const transcribeAudio = onObjectFinalized(
         userId
       );
 
-      const transformDurationMs = Date.now() - transformStartTime;
-      console.debug('[Transcribe] Transform complete:', {
+      const transformDurationMs = Math.round(performance.now() - transformStartTime);
+      convLog.debug('Transform complete', {
+        stage: 'merge',
         transformDurationMs,
         finalSegmentCount: processedData.segments.length,
         termOccurrenceCount: processedData.termOccurrences.length,
@@ -336,8 +364,8 @@ export const transcribeAudio = onObjectFinalized(
       });
 
       // Save results to Firestore
-      console.debug('[Transcribe] Saving results to Firestore...');
-      const firestoreStartTime = Date.now();
+      convLog.debug('Saving results to Firestore', { stage: 'firestore' });
+      const firestoreStartTime = performance.now();
       await db.collection('conversations').doc(conversationId).update({
         ...processedData,
         status: 'complete',
@@ -346,11 +374,11 @@ export const transcribeAudio = onObjectFinalized(
         audioStoragePath: filePath,
         updatedAt: FieldValue.serverTimestamp()
       });
-      const firestoreDurationMs = Date.now() - firestoreStartTime;
+      const firestoreDurationMs = Math.round(performance.now() - firestoreStartTime);
 
-      const totalDurationMs = Date.now() - downloadStartTime;
-      console.log('[Transcribe] ✅ Transcription complete (NEW ARCHITECTURE):', {
-        conversationId,
+      const totalDurationMs = Math.round(performance.now() - downloadStartTime);
+      convLog.info('✅ Transcription complete', {
+        stage: 'transcribe',
         segmentCount: processedData.segments.length,
         speakerCount: Object.keys(processedData.speakers).length,
         termCount: Object.keys(processedData.terms).length,
@@ -386,8 +414,8 @@ export const transcribeAudio = onObjectFinalized(
       // Calculate estimated costs based on pricing from database
       const estimatedCost = await calculateCost(llmUsage);
 
-      console.log('[Transcribe] LLM usage and cost breakdown:', {
-        conversationId,
+      convLog.info('LLM usage and cost breakdown', {
+        stage: 'metrics',
         geminiAnalysisTokens: geminiAnalysisTokens.inputTokens + geminiAnalysisTokens.outputTokens,
         geminiCorrectionTokens: geminiCorrectionTokens.inputTokens + geminiCorrectionTokens.outputTokens,
         whisperxComputeSec: llmUsage.whisperx.computeTimeSeconds.toFixed(1),
@@ -440,8 +468,8 @@ export const transcribeAudio = onObjectFinalized(
     } catch (error) {
       const errorMessage = error instanceof Error ? error.message : 'Unknown error';
 
-      console.error('[Transcribe] ❌ Transcription failed:', {
-        conversationId,
+      convLog.error('❌ Transcription failed', {
+        stage: 'transcribe',
         errorType: error instanceof Error ? error.constructor.name : typeof error,
         errorMessage,
         errorStack: error instanceof Error ? error.stack : undefined
@@ -493,7 +521,7 @@ export const transcribeAudio = onObjectFinalized(
         updatedAt: FieldValue.serverTimestamp()
       });
 
-      console.debug('[Transcribe] Firestore updated with failed status');
+      convLog.debug('Firestore updated with failed status', { stage: 'firestore' });
     }
   }
 );
@@ -638,8 +666,9 @@ function fixSegmentBoundaries(
     console.log(`[FixBoundaries] Moved ${movedCount} sentence fragments to previous segments`);
   }
 
-  // Re-index segments
-  return result.map((seg, idx) => ({ ...seg, index: idx }));
+  // Fragments move between neighbours but no segment is added or removed,
+  // so the indices assigned in buildSegmentsFromWhisperX are still correct
+  return result;
 }
 
 /**